@@ -7,7 +7,26 @@ Basically everything is done through the **get_data** function.
 """
 
 from typing import Callable, Iterator, Union, Optional, List, Iterable, MutableMapping
+import collections
 import datetime
+import functools
+import os
+import rpnpy.librmn.all as rmn
+
+#extensions of files considered when searching a directory for standard files
+#   eg. ('.fst', '.std', '') where '' is for files without extension, numeric extensions 
+#   (eg. 2016081200_000.0001) are then always considered
+#   only used when no suffix is given, None (default) searches all files
+fst_extensions = None
+
+#values matching anything in librmn searches
+_FST_ANY_INT = -1
+_FST_ANY_STR = ' '
+
+#set to True to save results of directory searches in a per-user cache directory
+#   $XDG_CACHE_HOME/domcmc or ~/.cache/domcmc, nothing is written in the searched directories
+#   by default all files are searched every time
+use_dir_cache = False
 
 def get_data(file_name:     Optional[str]=None,
              dir_name:      Optional[str]=None,
@@ -27,7 +46,8 @@ def get_data(file_name:     Optional[str]=None,
              pres_from_var: Optional[bool]=False,
              pres_levels:   Optional[Iterable[int]]=None,
              v_interp_type: Optional[str]=None,
-             tmp_dir:       Optional[str]=None) :
+             tmp_dir:       Optional[str]=None,
+             strict_unique: Optional[bool]=False) :
 
 
     """ Read data from CMC 'standard' files 
@@ -47,8 +67,14 @@ def get_data(file_name:     Optional[str]=None,
                       Searching all files in large directories can take a while,
                       use prefix and suffix to constrain search.
                       Note that file_name superseeds dir_name
-       prefix:        In combination with dir_name; prefix of files to search
-       suffix:        In combination with dir_name; suffix of files to search
+                      With fst_tools.use_dir_cache = True (False by default), the file found is saved 
+                      in $XDG_CACHE_HOME/domcmc (or ~/.cache/domcmc) and reused by later searches 
+                      with the same criteria until files in dir_name change. A json file is then 
+                      rewritten, with a file lock, after every successful search.
+       prefix:        In combination with dir_name; prefix of files to search, glob patterns are accepted
+       suffix:        In combination with dir_name; suffix of files to search, glob patterns are accepted
+                      When suffix is '' and fst_tools.fst_extensions is set (None by default), only files 
+                      with one of these extensions or a numeric extension are searched.
        var_name:      Name of variable to read in fst file  eg:   UU, VV, TT, MPQC, etc.
                       If you set var_name = "wind_vectors",
                       output dictionary will contain different representations of the wind vectors
@@ -73,7 +99,11 @@ def get_data(file_name:     Optional[str]=None,
        v_interp_type: Type of vertical interpolation, default is "CUB_" must be one of:
                       "CUB_", "CUBP_", "LIN_", "NOI_" 
        tmp_dir:       /path/to/a/temporary/work/directory/   Only used for interpolation to pressure levels
-                      if None, $TMPDIR is used; may run out of space when large fields are interpolated
+                      if None, /dev/shm is used when it has enough free memory, $TMPDIR (or /tmp) otherwise; 
+                      may run out of space when large fields are interpolated
+       strict_unique: In combination with dir_name; by default the search stops at the first matching file,
+                      most recently modified files being searched first.
+                      If True, all files are searched and an error is raised if more than one file matches.
 
     Returns:
         {
@@ -111,16 +141,10 @@ def get_data(file_name:     Optional[str]=None,
 
 
     import numpy as np
-    import os
     import warnings
-    import glob
     import subprocess
-    import copy
-    import rpnpy.librmn.all as rmn
-    import rpnpy.utils.fstd3d as fstd3d
-    import rpnpy.vgd.all as vgd
-    from   rpnpy.rpndate import RPNDate
-    import datetime
+    import shutil
+    import tempfile
 
     #was varname specified
     if var_name is None :
@@ -141,22 +165,11 @@ def get_data(file_name:     Optional[str]=None,
                                      ig1       = ig1,    ig2          = ig2,          ig3   = ig3,          
                                      typvar    = typvar, etiquette    = etiquette,    
                                      latlon    = latlon,pres_from_var = pres_from_var, pres_levels = pres_levels,  
-                                     tmp_dir   = tmp_dir)
+                                     tmp_dir   = tmp_dir, strict_unique = strict_unique)
     
 
     #get cmc_timestamp from datev
-    if datev is None :
-        cmc_timestamp=None
-    else:
-        if isinstance(datev, datetime.datetime):
-            date_obj = RPNDate(datev)
-            cmc_timestamp = date_obj.datev
-        else:
-            #assume a cmc timestamp is passed
-            try:
-                cmc_timestamp=int(datev)
-            except:
-                raise ValueError('datev can only a datetime.datetime object OR a an integer representing a CMC timestamp')
+    cmc_timestamp = _cmc_timestamp(datev)
 
     #use file_name or find file with matching entry
     if file_name is not None :
@@ -177,60 +190,66 @@ def get_data(file_name:     Optional[str]=None,
                 return None
 
             #get a list of files in there
-            file_list = glob.glob(dir_name + '/' + prefix + '*' + suffix)
-            if len(file_list) == 0 :
-                warnings.warn('No files in :' + dir_name + '/' + prefix + '*' + suffix +' returning None')
-                return None
+            candidates = _scan_dir(dir_name, prefix, suffix)
+
+            #file found by a previous search with the same criteria
+            cache_key = [var_name, cmc_timestamp, ip1, ip2, ip3, ig1, ig2, ig3, 
+                         typvar, etiquette, pres_levels is not None, strict_unique]
+            file_to_read = _dir_cache_get(dir_name, prefix, suffix, cache_key, candidates)
 
-            file_to_read = None
-            for this_file in file_list :
-                found_file = None
-                if pres_levels is not None :
-                    #entries necessary for vertical interpolation
-                    var = _get_var(this_file, var_name,
-                                   datev=cmc_timestamp,
-                                   ip1=None, ip2=None, ip3=None,
-                                   ig1=ig1,  ig2=ig2,  ig3=ig3,
-                                   typvar=typvar, etiquette=etiquette,
-                                   meta_only=True, verbose=0,
-                                   skip_non_fst=True)
-                    if var is not None :
-                        #we found a file which contains entry at desired date
-                        #try to get P0 with that
-                        p0 = _get_var(this_file, 'P0',
-                                      datev=cmc_timestamp,
-                                      ip1=None, ip2=None, ip3=None,
-                                      ig1=ig1,  ig2=ig2,  ig3=ig3,
-                                      typvar=typvar, etiquette=etiquette,
-                                      meta_only=True, verbose=0,
-                                      skip_non_fst=True)
-                        if p0 is not None:
+            if file_to_read is None :
+                if len(candidates) == 0 :
+                    warnings.warn('No files in :' + dir_name + '/' + prefix + '*' + suffix +' returning None')
+                    return None
+
+                file_to_read = None
+                for (this_file, mtime_ns, size) in candidates :
+                    #non FST files are skipped, files after the first match are never checked
+                    if not _is_fst(this_file, mtime_ns, size) :
+                        continue
+                    found_file = None
+                    if pres_levels is not None :
+                        #entries necessary for vertical interpolation
+                        #   var_name and P0 are searched with the file opened only once
+                        found = _probe_file_for_vars(this_file, [var_name, 'P0'],
+                                                     datev=cmc_timestamp,
+                                                     ig1=ig1,  ig2=ig2,  ig3=ig3,
+                                                     typvar=typvar, etiquette=etiquette,
+                                                     assume_fst=True)
+                        if found is not None :
+                            #this file contains all necessary data
+                            found_file = this_file
+                    else :
+                        #entry necessary for normal retrieval
+                        #   only the meta is needed here, grids are read once the file is chosen
+                        found = _probe_file_for_vars(this_file, [var_name],
+                                                     datev=cmc_timestamp,
+                                                     ip1=ip1, ip2=ip2, ip3=ip3,
+                                                     ig1=ig1, ig2=ig2, ig3=ig3,
+                                                     typvar=typvar, etiquette=etiquette,
+                                                     assume_fst=True)
+                        if found is not None :
+                            #make sure date is the one we want, otherwise continue searching
+                            # fstinfx will erroneously return matching values when datestamps differ by less than one minute, hrrrr....
+                            meta = found[var_name]
+                            if meta['datev'] != cmc_timestamp:
+                                warnings.warn(f"Skipping entry returned at wrong date, we received {meta['datev']} but asked for{cmc_timestamp}")
+                                continue
                             #this file contains all necessary data
                             found_file = this_file
-                else :
-                    #entry necessary for normal retrieval
-                    var = _get_var(this_file, var_name,
-                                   datev=cmc_timestamp,
-                                   ip1=ip1, ip2=ip2, ip3=ip3,
-                                   ig1=ig1, ig2=ig2, ig3=ig3,
-                                   typvar=typvar, etiquette=etiquette,
-                                   meta_only=True, verbose=0,
-                                   skip_non_fst=True)
-                    if var is not None :
-                        #make sure date is the one we want, otherwise continue searching
-                        # fstinfx will erroneously return matching values when datestamps differ by less than one minute, hrrrr....
-                        if var['meta']['datev'] != cmc_timestamp:
-                            warnings.warn(f"Skipping entry returned at wrong date, we received {var['meta']['datev']} but asked for{cmc_timestamp}")
-                            continue
-                        #this file contains all necessary data
-                        found_file = this_file
-
-                if found_file is not None :
-                    if file_to_read is not None :
-                        raise RuntimeError('search criterion matched in two different files:'+file_to_read+'   '+this_file)
-                    else:
-                        file_to_read = this_file
-            #endfor
+
+                    if found_file is not None :
+                        if file_to_read is not None :
+                            raise RuntimeError('search criterion matched in two different files:'+file_to_read+'   '+this_file)
+                        else:
+                            file_to_read = this_file
+                            if not strict_unique:
+                                #first match is good enough
+                                break
+                #endfor
+
+                if file_to_read is not None :
+                    _dir_cache_put(dir_name, prefix, suffix, cache_key, candidates, file_to_read)
 
             #if no match found after iterating over all files, return None
             if file_to_read is None :
@@ -243,254 +262,502 @@ def get_data(file_name:     Optional[str]=None,
         else :
             raise ValueError('Please provide one of file_name or dir_name arguments')
 
-    #a random number for temporary files
-    rand = np.round(np.random.rand(1)*1e7).astype('int')
-    rand_str = '{:07d}'.format(rand[0])
-
     #temporary dir for this session
-    if tmp_dir is None :
-        tmp_dir = os.environ['TMPDIR']
-    #valid dir
-    if not os.path.exists(tmp_dir) :
-        raise ValueError('tmp_dir: ' + tmp_dir + ' is not a valid path ')
-
-    #vertical interpolation  to pressure levels is desired
-    remove_interpolated = False
-    if pres_levels is not None :
-        remove_interpolated = True
-
-        #comma separated string with list of levels [hPa]
-        level_str = ''
-        for thisLevel in pres_levels :
-            level_str += '{:07.2f}'.format(thisLevel)+','
-        level_str = level_str.rstrip(',')
-
-        if v_interp_type is None:
-            #default is cubic interpolation
-            v_interp_type = 'CUB_'
-        else:
-            #check code for type of interpolation 
-            # has to be one of:
-            #CUB_    CUBIC   
-            #CUBP_   CUBIC   Clip negative values
-            #LIN_    LINEAR  
-            #NOI_    NO INTERPOLATION    Use for surface or 2D  variables only 
-            avail_interp_types = ['CUB_', 'CUBP_', 'LIN_', 'NOI_' ]
-            if v_interp_type not in avail_interp_types :
-                raise ValueError(  f'Vertical interpolation can only be one of: {avail_interp_types}, \n'
-                                 + f'see https://wiki.cmc.ec.gc.ca/wiki/Pxs2pxt for details. ')
-        var_str= v_interp_type + var_name
-
-
-        #get info on P0 and desired variable
-        p0 = _get_var(file_to_read, 'P0',
-                      datev=cmc_timestamp,
-                      ip1=None, ip2=None, ip3=None,
-                      ig1=ig1,  ig2=ig2,  ig3=ig3,
-                      typvar=typvar, etiquette=etiquette)
-        if p0 is None:
-            raise ValueError('P0 is necessary for vertical interpolation')
+    #   default is chosen once the size of temporary files is known
+    if tmp_dir is not None :
+        #valid dir
+        if not os.path.exists(tmp_dir) :
+            raise ValueError('tmp_dir: ' + tmp_dir + ' is not a valid path ')
+
+    #temporary files for interpolation to pressure levels are all in work_dir
+    #   it is removed whatever happens below
+    work_dir = None
+    try:
+        #vertical interpolation  to pressure levels is desired
+        remove_interpolated = False
+        prefetched_ll = None
+        if pres_levels is not None :
+            remove_interpolated = True
+
+            #comma separated string with list of levels [hPa]
+            level_str = ','.join(f'{this_level:07.2f}' for this_level in pres_levels)
+
+            if v_interp_type is None:
+                #default is cubic interpolation
+                v_interp_type = 'CUB_'
+            else:
+                #check code for type of interpolation 
+                # has to be one of:
+                #CUB_    CUBIC   
+                #CUBP_   CUBIC   Clip negative values
+                #LIN_    LINEAR  
+                #NOI_    NO INTERPOLATION    Use for surface or 2D  variables only 
+                avail_interp_types = ['CUB_', 'CUBP_', 'LIN_', 'NOI_' ]
+                if v_interp_type not in avail_interp_types :
+                    raise ValueError(  f'Vertical interpolation can only be one of: {avail_interp_types}, \n'
+                                     + f'see https://wiki.cmc.ec.gc.ca/wiki/Pxs2pxt for details. ')
+            var_str= v_interp_type + var_name
+
+
+            #get info on P0 and desired variable
+            #   with the source file opened only once
+            if not _is_fst_file(file_to_read) :
+                raise rmn.FSTDError("Not an FSTD file: %s " % file_to_read)
+            try:
+                iunit = rmn.fstopenall(file_to_read, rmn.FST_RO)
+            except:
+                raise rmn.FSTDError("File not found/readable: %s" % file_to_read)
+            try:
+                p0 = _read_var(iunit, file_to_read, 'P0',
+                               datev=cmc_timestamp,
+                               ip1=None, ip2=None, ip3=None,
+                               ig1=ig1,  ig2=ig2,  ig3=ig3,
+                               typvar=typvar, etiquette=etiquette)
+                var = None
+                if p0 is not None:
+                    var = _read_var(iunit, file_to_read, var_name,
+                                    datev=cmc_timestamp,
+                                    ip1=None, ip2=None, ip3=None,
+                                    ig1=ig1,  ig2=ig2,  ig3=ig3,
+                                    typvar=typvar, etiquette=etiquette,
+                                    meta_only=True, load_grid=False)
+            finally:
+                _fstcloseall(iunit)
+            if p0 is None:
+                raise ValueError('P0 is necessary for vertical interpolation')
+            if var is None:
+                raise ValueError(var_name + 'not found in source fst file')
+         
+            if tmp_dir is None :
+                #P0 and the interpolated variable are written to temporary files
+                n_levels = level_str.count(',') + 1
+                needed_bytes = 4 * p0['meta']['ni'] * p0['meta']['nj'] * (1 + n_levels)
+                tmp_dir = _default_tmp_dir(needed_bytes)
+
+            #files necessary for vertical interpolation
+            #   in a directory unique to this call
+            work_dir        = tempfile.mkdtemp(dir=tmp_dir, prefix='domcmc_')
+            pxs_file        = os.path.join(work_dir, 'tempPxsFile.fst')
+            interp_file     = os.path.join(work_dir, 'interplated.fst')
+
+            #check that variable and p0 are on same grid
+            if (p0['meta']['ig1'] == var['meta']['ig1']) and (p0['meta']['ig2'] == var['meta']['ig2']) :
+                #P0 and var are on the same grid
+
+                #first step is to get P0 in the pxs file
+                try:
+                   iunit = rmn.fstopenall(pxs_file,rmn.FST_RW)
+                except:
+                   raise rmn.FSTDError("File not found/readable: %s" % pxs_file)
+             
+                try:
+                   # Write P0 record + grid identifiers
+                   p0_entry = p0['meta']
+                   #values from _get_var are already Fortran ordered float32, copy only if needed
+                   p0_values = p0['values']
+                   if p0_values.dtype != np.float32 or not p0_values.flags.f_contiguous:
+                       p0_values = np.asfortranarray(p0_values, dtype=np.float32)
+                   p0_entry['d'] = p0_values
+                   rmn.fstecr(iunit, p0_entry)
+                   rmn.writeGrid(iunit, p0['grid'])
+                   rmn.fstecr(iunit, p0['toctoc'])
+                except:
+                   raise RuntimeError('something went wrong writing P0 fst file')
+                finally:
+                    # always close file
+                    _fstcloseall(iunit)
+            else:
+                #interpolate p0 to variable grid
+                #   Not sure this is needed anymore.... 
+                raise RuntimeError('hinterp with P0 on a different grid not implemented')
+
+            #Do the interpolation
+            #make sure interpolation package is loaded
+            if _find_pxs2pxt() is None:
+                raise RuntimeError('you must load pxs2pxt:   . ssmuse-sh -d eccc/cmd/cmdn/pxs2pxt/3.16.6/default')
+        
+            cmd= ['d.pxs2pxt', '-s'    , file_to_read,
+                               '-datev', '{:07d}'.format(p0['meta']['datev']),
+                               '-d'    , interp_file,
+                               '-pxs'  , pxs_file,
+                               '-plevs', level_str,
+                               '-var'  , var_str]
+            try:
+                proc = subprocess.Popen(cmd, stderr=subprocess.PIPE)
+            except OSError as err:
+                raise RuntimeError('Something went wrong with pxs2pxt, often speficying a tmp_dir solves the problem') from err
+
+            try:
+                #while pxs2pxt is running, get lat/lon of the output grid
+                #   one entry per subgrid for yin-yang grids
+                if latlon == True and p0['grid'] is not None:
+                    prefetched_ll = _grid_latlon(p0['grid'])
+            except BaseException:
+                #do not leave pxs2pxt running on error
+                proc.kill()
+                proc.wait()
+                raise
+
+            _, stderr = proc.communicate()
+
+            #error on nonzero exit status
+            if proc.returncode != 0:
+                raise rmn.FSTDError("Something went wrong with d.psx2pxt, read output and try to figure out what is wrong\n"
+                                    + stderr.decode(errors='replace'))
+
+            #write grid to interpolated file, may be needed for wind rotation
+            try:
+                iunit = rmn.fstopenall(interp_file,rmn.FST_RW)
+            except:
+                raise rmn.FSTDError("File not found/readable: %s" % interp_file)
+            try:
+                rmn.writeGrid(iunit, p0['grid'])
+            except:
+                raise RuntimeError('something went wrong writing grid to :'+interp_file)
+            finally:
+                _fstcloseall(iunit)
+
+            #cleanup
+            os.remove(pxs_file)
+
+            #change file_to_read to interpolated data file
+            file_to_read = interp_file
+
+        #END vertical interpolation if statement --------------------------------
 
+        #get fst data for output
+        #   values are kept 3D until the end
         var = _get_var(file_to_read, var_name,
                        datev=cmc_timestamp,
-                       ip1=None, ip2=None, ip3=None,
-                       ig1=ig1,  ig2=ig2,  ig3=ig3,
+                       ip1=ip1, ip2=ip2, ip3=ip3,
+                       ig1=ig1, ig2=ig2, ig3=ig3,
                        typvar=typvar, etiquette=etiquette,
-                       meta_only=True)
-        if var is None:
-            raise ValueError(var_name + 'not found in source fst file')
-         
-        #files necessary for vertical interpolation
-        pxs_file        = tmp_dir + '/' + rand_str + 'tempPxsFile.fst'
-        interp_file     = tmp_dir + '/' + rand_str + 'interplated.fst'
+                       squeeze=False,
+                       #the interpolated file is temporary, nothing about it is cached
+                       assume_fst=remove_interpolated, use_cache=not remove_interpolated)
 
-        #check that variable and p0 are on same grid
-        if (p0['meta']['ig1'] == var['meta']['ig1']) and (p0['meta']['ig2'] == var['meta']['ig2']) :
-            #P0 and var are on the same grid
+        #get 3D pressure if requested
+        if (var is not None) and pres_from_var :
 
-            #first step is to get P0 in the pxs file
+            #error trapping done by _get_var above
+            iunit = rmn.fstopenall(file_to_read,rmn.FST_RO)
             try:
-               iunit = rmn.fstopenall(pxs_file,rmn.FST_RW)
-            except:
-               raise rmn.FSTDError("File not found/readable: %s" % pxs_file)
-             
-            try:
-               # Write P0 record + grid identifiers
-               p0_entry = p0['meta']
-               p0_entry['d'] = np.asfortranarray(p0['values'],dtype='float32')
-               rmn.fstecr(iunit, p0_entry)
-               rmn.writeGrid(iunit, p0['grid'])
-               rmn.fstecr(iunit, p0['toctoc'])
-            except:
-               raise RuntimeError('something went wrong writing P0 fst file')
+                _add_pressure(var, iunit, cmc_timestamp)
             finally:
-                # always close file
-                rmn.fstcloseall(iunit)
-        else:
-            #interpolate p0 to variable grid
-            #   Not sure this is needed anymore.... 
-            raise RuntimeError('hinterp with P0 on a different grid not implemented')
+                _fstcloseall(iunit)
 
-        #Do the interpolation
-        #make sure interpolation package is loaded
-        try:
-            path = subprocess.check_output(["which", "d.pxs2pxt"])
-        except:
-            raise RuntimeError('you must load pxs2pxt:   . ssmuse-sh -d eccc/cmd/cmdn/pxs2pxt/3.16.6/default')
-        
-        cmd= ['d.pxs2pxt', '-s'    , file_to_read,
-                           '-datev', '{:07d}'.format(p0['meta']['datev']),
-                           '-d'    , interp_file,
-                           '-pxs'  , pxs_file,
-                           '-plevs', level_str,
-                           '-var'  , var_str]
-        try:
-            status = subprocess.call(cmd)
-        except:
-            raise RuntimeError('Something went wrong with pxs2pxt, often speficying a tmp_dir solves the problem')
+        #handle yin-yang grid in one record
+        # optionally output lat/lon information
+        if (var is not None):
+            _finalize_var(var, latlon=latlon, ll_list=prefetched_ll)
+    finally:
+        #remove fst files containing interpolated data
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
-        #error on nonzero exit status
-        if status != 0:
-            raise rmn.FSTDError("Something went wrong with d.psx2pxt, read output and try to figure out what is wrong")
+    return var
 
-        #write grid to interpolated file, may be needed for wind rotation
-        try:
-            iunit = rmn.fstopenall(interp_file,rmn.FST_RW)
-        except:
-            raise rmn.FSTDError("File not found/readable: %s" % interp_file)
-        try:
-            rmn.writeGrid(iunit, p0['grid'])
-        except:
-            raise RuntimeError('something went wrong writing grid to :'+interp_file)
-        finally:
-            rmn.fstcloseall(iunit)
+#end of get_data
+
+
+def get_data_batch(file_name:     str,
+                   var_names:     List[str],
+                   datev:         Optional[Union[int,datetime.datetime]]=None,
+                   ip1:           Optional[Union[List[int],int]]=None,
+                   ip2:           Optional[int]=None,
+                   ip3:           Optional[int]=None,
+                   ig1:           Optional[int]=None,
+                   ig2:           Optional[int]=None,
+                   ig3:           Optional[int]=None,
+                   typvar:        Optional[str]=None,
+                   etiquette:     Optional[str]=None,
+                   latlon:        Optional[bool]=False,
+                   pres_from_var: Optional[bool]=False) :
+    """ Read many variables from the same CMC 'standard' file
+
+    This method behaves like calling get_data(file_name=file_name, var_name=var_name, ...) 
+    for each of the variables in var_names. 
+    
+    The file is opened only once and the grids, lat/lon and vertical grid descriptors 
+    that are shared between variables are read only once.
+
+    Vertical interpolation to pressure levels and var_name='wind_vectors' are not 
+    supported, use get_data for these.
+
+    Args:
+       file_name:     /path/to/fst/file.fst
+       var_names:     List of variables to read eg: ['UU', 'VV', 'TT']
+       other args:    Same as for get_data
 
-        #cleanup
-        os.remove(pxs_file)
+    Returns:
+        {var_name: output of get_data for this variable, None if it was not found}
 
-        #change file_to_read to interpolated data file
-        file_to_read = interp_file
+        None is returned (with a warning) if file_name does not exist.
 
-    #END vertical interpolation if statement --------------------------------
+    """
 
-    #get fst data for output
-    var = _get_var(file_to_read, var_name,
-                   datev=cmc_timestamp,
-                   ip1=ip1, ip2=ip2, ip3=ip3,
-                   ig1=ig1, ig2=ig2, ig3=ig3,
-                   typvar=typvar, etiquette=etiquette)
+    import warnings
+
+    if 'wind_vectors' in var_names:
+        raise ValueError('wind_vectors not supported by get_data_batch, use get_data')
 
-    #get 3D pressure if requested
-    if (var is not None) and pres_from_var :
+    if not os.path.isfile(file_name) :
+        #files does not exist, throw a warning and return None
+        warnings.warn('file_name: ' + file_name + ' does not exist')
+        return None
+
+    cmc_timestamp = _cmc_timestamp(datev)
+
+    if not _is_fst_file(file_name) :
+        raise rmn.FSTDError("Not an FSTD file: %s " % file_name)
+    try:
+        iunit = rmn.fstopenall(file_name, rmn.FST_RO)
+    except:
+        raise rmn.FSTDError("File not found/readable: %s" % file_name)
 
-        #error trapping done by _get_var above
-        iunit = rmn.fstopenall(file_to_read,rmn.FST_RO)
+    #lat/lon, vgrid and P0 shared between variables
+    ll_cache = {}
+    vgrid_cache = {}
+    rfld_cache = {}
+
+    out_dict = {}
+    try:
+        for var_name in var_names:
+            var = _read_var(iunit, file_name, var_name,
+                            datev=cmc_timestamp,
+                            ip1=ip1, ip2=ip2, ip3=ip3,
+                            ig1=ig1, ig2=ig2, ig3=ig3,
+                            typvar=typvar, etiquette=etiquette,
+                            squeeze=False)
+
+            if var is not None :
+                if pres_from_var :
+                    _add_pressure(var, iunit, cmc_timestamp, vgrid_cache=vgrid_cache, rfld_cache=rfld_cache)
+
+                ll_list = None
+                if latlon == True :
+                    meta = var['meta']
+                    grid_key = (meta['grtyp'], meta['ni'], meta['nj'], 
+                                meta['ig1'], meta['ig2'], meta['ig3'], meta['ig4'])
+                    if grid_key not in ll_cache:
+                        ll_cache[grid_key] = _grid_latlon(var['grid'])
+                    ll_list = ll_cache[grid_key]
+
+                _finalize_var(var, latlon=latlon, ll_list=ll_list)
+
+            out_dict[var_name] = var
+    finally:
+        _fstcloseall(iunit)
+
+    return out_dict
+
+
+def _cmc_timestamp(datev):
+    """
+    CMC timestamp from a datetime.datetime object or something that can be converted to int
+
+    None is returned for datev=None
+    """
+    from rpnpy.rpndate import RPNDate
+
+    if datev is None :
+        return None
+
+    if isinstance(datev, datetime.datetime):
+        date_obj = RPNDate(datev)
+        return date_obj.datev
+    else:
+        #assume a cmc timestamp is passed
+        try:
+            return int(datev)
+        except:
+            raise ValueError('datev can only a datetime.datetime object OR a an integer representing a CMC timestamp')
+
+
+def _add_pressure(var, iunit, cmc_timestamp, vgrid_cache=None, rfld_cache=None):
+    """
+    Add 3D pressure associated with var['values'] to var
+
+    iunit is the opened fst file from which var was read.
+    vgrid_cache and rfld_cache are optional dictionaries where vertical grid descriptors 
+    and reference fields (P0) are kept between calls
+    """
+    import rpnpy.utils.fstd3d as fstd3d
+    import rpnpy.vgd.all as vgd
 
+    #linked ip1/ig1 ip2/ig2
+    vgrid_key = (var['meta']['ig1'], var['meta']['ig2'])
+    if vgrid_cache is not None and vgrid_key in vgrid_cache:
+        vgrid = vgrid_cache[vgrid_key]
+    else:
         try:
-            #linked ip1/ig1 ip2/ig2
             vgrid = vgd.vgd_read(iunit, ip1=var['meta']['ig1'], ip2=var['meta']['ig2'])
         except:
-            rmn.fstcloseall(iunit)
             raise RuntimeError('something went wrong getting vertical grid descriptor')
+        if vgrid_cache is not None:
+            vgrid_cache[vgrid_key] = vgrid
 
+    this_datev = cmc_timestamp if cmc_timestamp is not None else -1
+
+    #coordinates needing only one reference field are computed directly from it
+    press = _levels_press_from_rfld(iunit, vgrid, var['meta'], var['values'].shape[0:2], var['ip1_list'],
+                                    this_datev, rfld_cache)
+    if press is None:
         try:
-            this_datev = cmc_timestamp if cmc_timestamp is not None else -1
             press = fstd3d.get_levels_press(iunit, vgrid, var['values'].shape[0:2], var['ip1_list'],
-                                            datev=this_datev)
+                                            datev=this_datev)['phPa']
         except:
             raise RuntimeError('something went wrong with pressure retrieval')
-        finally:
-            rmn.fstcloseall(iunit)
 
-        #add pressure to output dictionary
-        var['pressure'] = press['phPa']
+    #add pressure to output dictionary
+    var['pressure'] = press
 
 
-    #handle yin-yang grid in one record
-    # optionally output lat/lon information
-    if (var is not None):
+def _levels_press_from_rfld(iunit, vgrid, meta, shape, ip1_list, datev, rfld_cache=None):
+    """
+    Pressure [hPa] of levels in ip1_list computed with vgd_levels from a reference field read once
 
-        if 'nsubgrids' not in var['grid']:
-            ngrids = 1
-        else:
-            ngrids = var['grid']['nsubgrids']
-
-        if ngrids == 1 and latlon == True :
-	    #single grid -> not yin-yang
-            ll_dict = rmn.gdll(var['grid'])
-            var['lat'] = ll_dict['lat']
-            var['lon'] = ll_dict['lon']
-
-        elif ngrids == 2: 
-	    #two grids -> yin-yang
-	    #In this case, the outdict is modified to output data on the two grids
-            #with the "unnamed" defaut output refering to the yin grid.
-
-            #links to common entries in var dict
-            var['yin']  = {'meta':     var['meta'],
-                           'toctoc':   var['toctoc'],
-                           'ip1_list': var['ip1_list'],
-                           'lev_list': var['lev_list']}
-            var['yang'] = {'meta':     var['meta'],
-                           'toctoc':   var['toctoc'],
-                           'ip1_list': var['ip1_list'],
-                           'lev_list': var['lev_list']}
-
-            #yin grid 
-            var['yin']['grid']  = copy.deepcopy(var['grid']['subgrid'][0])
-            #yang grid 
-            var['yang']['grid'] = copy.deepcopy(var['grid']['subgrid'][1])
-            # add combined YY grid descriptor to be able to write '^>' entries in fst files
-            var['combined_yy_grid'] = copy.deepcopy(var['grid'])
-            #grid in var dict is a link to yin grid
-            var['grid'] = var['yin']['grid']
-
-            #temp copy of values
-            yy_values = copy.deepcopy(var['values'])
-
-            if yy_values.ndim == 2:
-                #2D field
-                nx, ny = yy_values.shape
-                half_ny = int(ny/2)
-                #yin values 
-                var['yin']['values']  = copy.deepcopy(yy_values[:,:half_ny])
-                #yang values 
-                var['yang']['values'] = copy.deepcopy(yy_values[:,half_ny:])
-            elif yy_values.ndim == 3:
-                #3D field
-                nx, ny, nz = yy_values.shape
-                half_ny = int(ny/2)
-                #yin values 
-                var['yin']['values']  = copy.deepcopy(yy_values[:,:half_ny,:])
-                #yang values 
-                var['yang']['values'] = copy.deepcopy(yy_values[:,half_ny:,:])
-            else:
-                raise ValueError('values should be 2D or 3D')
-
-            #values in var is a link to yin values
-            var['values'] = var['yin']['values']
-
-            #outout latlon if desired
-            if latlon == True :
-                #yin
-                ll_yin  = rmn.gdll(var['yin']['grid'])
-                var['yin']['lat'] = copy.deepcopy(ll_yin['lat'])
-                var['yin']['lon'] = copy.deepcopy(ll_yin['lon'])
-                #yang
-                ll_yang = rmn.gdll(var['yang']['grid'])
-                var['yang']['lat'] = copy.deepcopy(ll_yang['lat'])
-                var['yang']['lon'] = copy.deepcopy(ll_yang['lon'])
-                #latlon in var are those of the yin grid
-                var['lat'] = var['yin']['lat']
-                var['lon'] = var['yin']['lon']
-
-    #remove fst file containing interpolated data
-    if remove_interpolated:
-        os.remove(interp_file)
+    Only vertical coordinates with P0 [hPa] as their single reference field are handled.
+    The reference field is taken on the same grid (IGs of meta) as the variable.
 
-    return var
+    Returns
+    3D pressure array, None when the vertical coordinate or reference field cannot be handled here
+    """
+    import rpnpy.vgd.all as vgd
 
-#end of get_data
+    try:
+        rfld_name = vgd.vgd_get(vgrid, 'RFLD')
+    except vgd.VGDError:
+        return None
+    try:
+        rfls_name = vgd.vgd_get(vgrid, 'RFLS')
+    except vgd.VGDError:
+        rfls_name = None
+    if not rfld_name or rfld_name.strip() != 'P0' or (rfls_name and rfls_name.strip() != ''):
+        #reference field other than P0 (eg. ME) or more than one
+        #   these are left to fstd3d.get_levels_press
+        return None
+
+    #variables on different grids get different reference fields
+    rfld_key = (rfld_name, datev, tuple(shape), meta['ig1'], meta['ig2'], meta['ig3'])
+    if rfld_cache is not None and rfld_key in rfld_cache:
+        rfld = rfld_cache[rfld_key]
+    else:
+        key_dict = _my_fstinf(iunit, datev=datev, nomvar=rfld_name,
+                              ig1=meta['ig1'], ig2=meta['ig2'], ig3=meta['ig3'])
+        if key_dict is None:
+            return None
+        rec = rmn.fstluk(key_dict['key'])
+        #P0 in Pa
+        rfld = rec['d'] * 100.
+        if rfld_cache is not None:
+            rfld_cache[rfld_key] = rfld
+    if rfld.shape[0:2] != tuple(shape):
+        return None
+
+    try:
+        press = vgd.vgd_levels(vgrid, rfld=rfld, ip1list=list(ip1_list))
+    except vgd.VGDError:
+        return None
+
+    #Pa to hPa without a copy
+    press /= 100.
+    return press
+
+
+def _grid_latlon(grid):
+    """
+    Lat/lon of a grid as returned by rmn.gdll
+
+    Returns
+    list with one dictionary of lat/lon per subgrid, only one for grids that are not yin-yang
+    """
+    if grid.get('nsubgrids', 1) == 1:
+        return [rmn.gdll(grid)]
+    else:
+        return [rmn.gdll(subgrid) for subgrid in grid['subgrid']]
+
+
+def _finalize_var(var, latlon=False, ll_list=None):
+    """
+    Finalize the output dictionary of get_data from what was returned by _get_var
+
+        - Yin and Yang grids are separated
+        - lat/lon are added if latlon=True, ll_list is the output of _grid_latlon if it was already computed
+        - single level values are squeezed to 2D
+    """
+    import numpy as np
+
+    if latlon == True and ll_list is None:
+        ll_list = _grid_latlon(var['grid'])
+
+    if 'nsubgrids' not in var['grid']:
+        ngrids = 1
+    else:
+        ngrids = var['grid']['nsubgrids']
+
+    if ngrids == 1 and latlon == True :
+        #single grid -> not yin-yang
+        ll_dict = ll_list[0]
+        var['lat'] = ll_dict['lat']
+        var['lon'] = ll_dict['lon']
+
+    elif ngrids == 2: 
+        #two grids -> yin-yang
+        #In this case, the outdict is modified to output data on the two grids
+        #with the "unnamed" defaut output refering to the yin grid.
+
+        #links to common entries in var dict
+        var['yin']  = {'meta':     var['meta'],
+                       'toctoc':   var['toctoc'],
+                       'ip1_list': var['ip1_list'],
+                       'lev_list': var['lev_list']}
+        var['yang'] = {'meta':     var['meta'],
+                       'toctoc':   var['toctoc'],
+                       'ip1_list': var['ip1_list'],
+                       'lev_list': var['lev_list']}
+
+        #yin grid 
+        #   shallow copies, grid descriptors are shared with the grid cache and are not modified
+        var['yin']['grid']  = dict(var['grid']['subgrid'][0])
+        #yang grid 
+        var['yang']['grid'] = dict(var['grid']['subgrid'][1])
+        # add combined YY grid descriptor to be able to write '^>' entries in fst files
+        var['combined_yy_grid'] = dict(var['grid'])
+        #grid in var dict is a link to yin grid
+        var['grid'] = var['yin']['grid']
+
+        #yin and yang values are views on the two halves of values, no copy is made
+        yy_values = var['values']
+        if yy_values.ndim not in (2, 3):
+            raise ValueError('values should be 2D or 3D')
+        #yin values in first half of second dimension, yang values in the second half
+        var['yin']['values'], var['yang']['values'] = np.split(yy_values, 2, axis=1)
+
+        #values in var is a link to yin values
+        var['values'] = var['yin']['values']
+
+        #outout latlon if desired
+        #   ll_list is computed for this call only, its arrays are used without copy
+        if latlon == True :
+            ll_yin, ll_yang = ll_list
+            #yin
+            var['yin']['lat'] = ll_yin['lat']
+            var['yin']['lon'] = ll_yin['lon']
+            #yang
+            var['yang']['lat'] = ll_yang['lat']
+            var['yang']['lon'] = ll_yang['lon']
+            #latlon in var are those of the yin grid
+            var['lat'] = var['yin']['lat']
+            var['lon'] = var['yin']['lon']
+
+    #single level outputs are 2D
+    if 'yin' in var:
+        var['yin']['values']  = np.squeeze(var['yin']['values'])
+        var['yang']['values'] = np.squeeze(var['yang']['values'])
+        var['values'] = var['yin']['values']
+    else:
+        var['values'] = np.squeeze(var['values'])
 
 
 def read_and_rotate_winds(file_name:     Optional[str]=None,
@@ -509,7 +776,8 @@ def read_and_rotate_winds(file_name:     Optional[str]=None,
                           latlon:        Optional[bool]=False,
                           pres_from_var: Optional[bool]=False,
                           pres_levels:   Optional[Iterable[int]]=None,
-                          tmp_dir:       Optional[str]=None) :
+                          tmp_dir:       Optional[str]=None,
+                          strict_unique: Optional[bool]=False) :
     """Read winds from standard files and rotate them to get the W-E S-N components
 
     This method behaves just like get_data.
@@ -558,26 +826,38 @@ def read_and_rotate_winds(file_name:     Optional[str]=None,
 
     """
 
-    import copy
     import warnings
 
-    #get UU
-    uu_dict = get_data(var_name = 'UU', file_name   = file_name,    dir_name = dir_name,     
-                       prefix   = prefix, suffix    = suffix,       datev    = datev,        
-                       ip1      = ip1,    ip2       = ip2,          ip3      = ip3,          
-                       ig1      = ig1,    ig2       = ig2,          ig3      = ig3,          
-                       typvar   = typvar, etiquette = etiquette,    
-                       latlon   = True, pres_from_var = pres_from_var, pres_levels = pres_levels,  
-                       tmp_dir  = tmp_dir)
-
-    #get VV
-    vv_dict = get_data(var_name = 'VV', file_name   = file_name,    dir_name = dir_name,     
-                       prefix   = prefix, suffix    = suffix,       datev    = datev,        
-                       ip1      = ip1,    ip2       = ip2,          ip3      = ip3,          
-                       ig1      = ig1,    ig2       = ig2,          ig3      = ig3,          
-                       typvar   = typvar, etiquette = etiquette,    
-                       latlon   = True, pres_from_var = pres_from_var, pres_levels = pres_levels,  
-                       tmp_dir  = tmp_dir)
+    if file_name is not None and pres_levels is None:
+        #UU and VV are read with the file opened only once
+        batch = get_data_batch(file_name, ['UU', 'VV'],
+                               datev     = datev,     ip1    = ip1,    ip2 = ip2, ip3 = ip3,
+                               ig1       = ig1,       ig2    = ig2,    ig3 = ig3,
+                               typvar    = typvar,    etiquette = etiquette,
+                               latlon    = True,      pres_from_var = pres_from_var)
+        if batch is None:
+            uu_dict, vv_dict = None, None
+        else:
+            uu_dict, vv_dict = batch['UU'], batch['VV']
+    else:
+        #get UU
+        uu_dict = get_data(var_name = 'UU', file_name   = file_name,    dir_name = dir_name,     
+                           prefix   = prefix, suffix    = suffix,       datev    = datev,        
+                           ip1      = ip1,    ip2       = ip2,          ip3      = ip3,          
+                           ig1      = ig1,    ig2       = ig2,          ig3      = ig3,          
+                           typvar   = typvar, etiquette = etiquette,    
+                           latlon   = True, pres_from_var = pres_from_var, pres_levels = pres_levels,  
+                           tmp_dir  = tmp_dir,  strict_unique = strict_unique)
+
+        #get VV
+        #   VV is on the same grid as UU, lat/lon of UU are used for both
+        vv_dict = get_data(var_name = 'VV', file_name   = file_name,    dir_name = dir_name,     
+                           prefix   = prefix, suffix    = suffix,       datev    = datev,        
+                           ip1      = ip1,    ip2       = ip2,          ip3      = ip3,          
+                           ig1      = ig1,    ig2       = ig2,          ig3      = ig3,          
+                           typvar   = typvar, etiquette = etiquette,    
+                           latlon   = False, pres_from_var = pres_from_var, pres_levels = pres_levels,  
+                           tmp_dir  = tmp_dir,  strict_unique = strict_unique)
 
     if uu_dict is None or vv_dict is None:
         warnings.warn('Found no matching entries for UU or VV')
@@ -587,8 +867,8 @@ def read_and_rotate_winds(file_name:     Optional[str]=None,
     if 'yin' in uu_dict.keys():
 
         #prepare output dict based on what we got from UU
-        output_dict = copy.deepcopy(uu_dict)
-        del output_dict['values']
+        #   shallow copy, without 'values' that are replaced by the wind entries below
+        output_dict = {key: val for key, val in uu_dict.items() if key != 'values'}
 
         #Yin-Yang grid iterate over the two lams
         for yy in ['yin','yang']:
@@ -602,11 +882,11 @@ def read_and_rotate_winds(file_name:     Optional[str]=None,
                                                     this_lat, this_lon,
                                                     grid)
 
-            #remove 'values' entry in dict
-            del output_dict[yy]['values']
+            #entries of this subgrid without 'values'
+            output_dict[yy] = {key: val for key, val in uu_dict[yy].items() if key != 'values'}
             #add the 6 wind entries
-            output_dict[yy]['uu']   = uu_dict['values']
-            output_dict[yy]['vv']   = vv_dict['values']
+            output_dict[yy]['uu']   = this_UU
+            output_dict[yy]['vv']   = this_VV
             output_dict[yy]['uuwe'] = uuwe
             output_dict[yy]['vvsn'] = vvsn
             output_dict[yy]['uv']   = uv
@@ -626,11 +906,7 @@ def read_and_rotate_winds(file_name:     Optional[str]=None,
         this_UU  = uu_dict['values']
         this_VV  = vv_dict['values']
         this_lat = uu_dict['lat'] 
-        if this_lat.shape != vv_dict['lat'].shape:
-            raise ValueError('latitudes of uu and vv must be of the same shape')
         this_lon = uu_dict['lon']
-        if this_lon.shape != vv_dict['lon'].shape:
-            raise ValueError('longitudes of uu and vv must be of the same shape')
         grid = uu_dict['grid']
     
         uuwe, vvsn, uv, wd = uu_vv_to_uuwe_vvsn(this_UU , this_VV ,
@@ -638,9 +914,8 @@ def read_and_rotate_winds(file_name:     Optional[str]=None,
                                                 grid)
 
         #construct output dictionary  based on uu_dict
-        output_dict = copy.deepcopy(uu_dict)
-        #remove 'values' entry in dict
-        del output_dict['values']
+        #   shallow copy without 'values' entry
+        output_dict = {key: val for key, val in uu_dict.items() if key != 'values'}
         #add the 6 wind entries
         output_dict['uu']   = uu_dict['values']
         output_dict['vv']   = vv_dict['values']
@@ -723,26 +998,34 @@ def uu_vv_to_uuwe_vvsn(UU, VV,
     rot_angle = np.deg2rad(wd0 + 180.)    #+180 because we need arrow to point in wind direction for wind vectors
 
     #the same rotation is applied to all points in a column
-    #if UU and VV are 3D, stack 2d rotation matrix to match
+    #if UU and VV are 3D, a trailing axis lets the 2d rotation broadcast along levels
     if UU.ndim == 3:
-        rot_angle = np.broadcast_to(rot_angle[...,np.newaxis], UU.shape)
-
-    #decompose UU and VV
-    modulus_kts      = np.sqrt(UU**2. + VV**2.) 
-    modulus_mps      = modulus_kts * 0.514444  #conversion from knots to m/s here
-    angle_before     = np.arctan2(UU, VV)
-
-    #apply rotation
-    angle_after = angle_before + rot_angle
-
-    #back to U-V representation this time along East-West South-North axes
-    uuwe = modulus_mps * np.sin(angle_after)
-    vvsn = modulus_mps * np.cos(angle_after)
+        rot_angle = rot_angle[...,np.newaxis]
+    cos_rot = np.cos(rot_angle)
+    sin_rot = np.sin(rot_angle)
+
+    #modulus of wind 
+    modulus_kts      = np.hypot(UU, VV) 
+
+    #apply rotation directly to the U-V components
+    #   sin(a+r) and cos(a+r) with sin(a) = UU/modulus and cos(a) = VV/modulus
+    #   0.514444 is for conversion from knots to m/s
+    #   operations are done in place to limit the number of full size temporary arrays
+    uuwe  = UU * cos_rot
+    uuwe += VV * sin_rot
+    uuwe *= 0.514444
+    vvsn  = VV * cos_rot
+    vvsn -= UU * sin_rot
+    vvsn *= 0.514444
 
     #return values
     uv = modulus_kts
     #add 180 deg for direction where the wind is from
-    wd = np.mod(np.rad2deg(angle_after) + 180., 360.)
+    wd  = np.arctan2(UU, VV)
+    wd += rot_angle
+    np.rad2deg(wd, out=wd)
+    wd += 180.
+    np.mod(wd, 360., out=wd)
 
     return uuwe, vvsn, uv, wd
 
@@ -754,7 +1037,8 @@ def _get_var(file_name, var_name,
              ig1=None, ig2=None, ig3=None,
              typvar=None, etiquette=None,
              meta_only=False, shape_only=None, 
-             verbose=0, skip_non_fst=False) :
+             verbose=0, skip_non_fst=False, squeeze=True,
+             assume_fst=False, use_cache=True) :
     """
     get variable in fst file
 
@@ -770,12 +1054,16 @@ def _get_var(file_name, var_name,
 
         if meta_only=True the routine returns the meta data for the first entry and stops
 
+        if squeeze=False values are always 3D, even when only one level is found
+
+        if assume_fst=True the check that file_name is a standard file is skipped,
+        use it when the caller already checked
+
+        if use_cache=False nothing is saved in the module caches, use it for temporary files
+
     """
-    import numpy as np
-    import rpnpy.librmn.all as rmn
-    import warnings
 
-    if not rmn.isFST(file_name) :
+    if (not assume_fst) and (not _is_fst_file(file_name)) :
         if skip_non_fst == False :
             #default behaviour is to abort on non FST files
             raise rmn.FSTDError("Not an FSTD file: %s " % file_name)
@@ -783,32 +1071,84 @@ def _get_var(file_name, var_name,
             #with skip_non_fst=True, None is returned without error
             return None
      
+    #searches that already found nothing in this version of the file are not repeated
+    #   the file is searched again with verbose > 0 to print what was not found
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        raise rmn.FSTDError("File not found/readable: %s" % file_name)
+    miss_key = (os.path.realpath(file_name), var_name, datev,
+                tuple(ip1) if type(ip1) is list else ip1, ip2, ip3,
+                ig1, ig2, ig3, typvar, etiquette)
+    file_version = (stat.st_mtime_ns, stat.st_size)
+    if use_cache and verbose == 0 and _lru_get(_MISS_CACHE, miss_key, file_version):
+        return None
+
     # Open
     try:
         iunit = rmn.fstopenall(file_name, rmn.FST_RO)
     except:
         raise rmn.FSTDError("File not found/readable: %s" % file_name)
-     
+
+    try:
+        var = _read_var(iunit, file_name, var_name,
+                        datev=datev,
+                        ip1=ip1, ip2=ip2, ip3=ip3,
+                        ig1=ig1, ig2=ig2, ig3=ig3,
+                        typvar=typvar, etiquette=etiquette,
+                        meta_only=meta_only, shape_only=shape_only,
+                        verbose=verbose, squeeze=squeeze, use_cache=use_cache)
+    finally:
+        # Close file
+        _fstcloseall(iunit)
+
+    if var is None and use_cache:
+        _lru_put(_MISS_CACHE, miss_key, file_version, True)
+    return var
+
+#end _get_var---------------------------
+
+
+def _read_var(iunit, file_name, var_name,
+              datev=None,
+              ip1=None, ip2=None, ip3=None,
+              ig1=None, ig2=None, ig3=None,
+              typvar=None, etiquette=None,
+              meta_only=False, shape_only=None, 
+              verbose=0, squeeze=True, load_grid=True, use_cache=True) :
+    """
+    Same as _get_var for a fst file that is already opened
+
+    file_name is only used for caching grids and printing
+
+    with load_grid=False, the grid and toctoc are not read and are set to None in the output
+
+    with use_cache=False, grids and toctoc are not cached, use it for temporary files
+    """
+    import numpy as np
+    import warnings
+
+    #unspecified search criteria match anything
+    criteria = _search_criteria(datev=datev, etiket=etiquette,
+                                ip2=ip2, ip3=ip3, typvar=typvar)
+
     #look for first entry matching search criteria 
     if type(ip1) is list :
         for myip1 in ip1 :
-            key_dict = _my_fstinf(iunit, datev=datev, etiket=etiquette,
-                                  ip1=myip1, ip2=ip2, ip3=ip3,
+            key_dict = _my_fstinf(iunit, ip1=myip1,
                                   ig1=ig1, ig2=ig2, ig3=ig3,
-                                  typvar=typvar, nomvar=var_name)
+                                  nomvar=var_name, **criteria)
             if key_dict is not None:
             # found at least one record
                 break
     else:
-        key_dict = _my_fstinf(iunit, datev=datev, etiket=etiquette,
-                              ip1=ip1, ip2=ip2, ip3=ip3,
+        key_dict = _my_fstinf(iunit, ip1=_FST_ANY_INT if ip1 is None else ip1,
                               ig1=ig1, ig2=ig2, ig3=ig3,
-                              typvar=typvar, nomvar=var_name)
+                              nomvar=var_name, **criteria)
 
     if key_dict is None :
         nz = 0
         is_there = False
-        rmn.fstcloseall(iunit)
         if verbose > 0 :
             print('Did not find anything in:')
             print(file_name)
@@ -835,23 +1175,10 @@ def _get_var(file_name, var_name,
 
         #get meta for this entry
         nz = 1
-        ref_meta = rmn.fstprm(key_dict['key'])
-        (rp1, rp2, rp3) = rmn.DecodeIp(ref_meta['ip1'],ref_meta['ip2'],ref_meta['ip3'])
-        #get grid
-        try:
-            grid     = rmn.readGrid(iunit, ref_meta)
-        except:
-            warnings.warn('rmn.readGrid encountered a problem, setting grid to None')
-            grid = None
-        #get vgrid
-        try:
-            toctoc   = rmn.fstlir(iunit,nomvar='!!',ip1=ref_meta['ig1'],ip2=ref_meta['ig2'])
-        except:
-            warnings.warn('No !! entry found in file, setting toctoc to None')
-            toctoc = None
+        ref_meta = _cached_fstprm(iunit, key_dict['key'])
 
         if meta_only :
-            rmn.fstcloseall(iunit)
+            grid, toctoc = _get_grid_cached(iunit, file_name, ref_meta, use_cache=use_cache) if load_grid else (None, None)
             return {'meta':ref_meta,'grid':grid,'toctoc':toctoc}
 
         if ip1 is None :
@@ -859,56 +1186,57 @@ def _get_var(file_name, var_name,
             #try to find matching entries for 3D field
             #with same meta but different ip1
 
-            #save ip1, and key for later
-            key_list = [key_dict['key']]
-            ip1_list = [ref_meta['ip1']]
-            lev_list = [rp1.v1]
-
-            key_dict, keep_this_one = _my_fstinfx(key_dict, iunit, datev=ref_meta['datev'], etiket=ref_meta['etiket'],
-                                                  ip1=None, ip2=ref_meta['ip2'], ip3=ref_meta['ip3'],
-                                                  ig1=ref_meta['ig1'], ig2=ref_meta['ig2'], ig3=ref_meta['ig3'],
-                                                  typvar=ref_meta['typvar'], nomvar=ref_meta['nomvar'])
-
-            while (key_dict is not None) :
+            #all entries are listed at once, the reference entry is among them
+            meta_list = _my_fstinl(iunit, datev=ref_meta['datev'], etiket=ref_meta['etiket'],
+                                   ip2=ref_meta['ip2'], ip3=ref_meta['ip3'],
+                                   ig1=ref_meta['ig1'], ig2=ref_meta['ig2'], ig3=ref_meta['ig3'],
+                                   typvar=ref_meta['typvar'], nomvar=ref_meta['nomvar'])
 
-                if keep_this_one :
-                    #we have a valid entry save info for later
-                    nz += 1
-                    meta = rmn.fstprm(key_dict['key'])
-                    (rp1, rp2, rp3) = rmn.DecodeIp(meta['ip1'],meta['ip2'],meta['ip3'])
-                    #save ip1, and key for later
-                    key_list.append(key_dict['key'])
-                    ip1_list.append(meta['ip1'])
-                    lev_list.append(rp1.v1)
-
-                #check if there are entries with same meta but different ip1
-                key_dict, keep_this_one = _my_fstinfx(key_dict, iunit, datev=ref_meta['datev'], etiket=ref_meta['etiket'],
-                                                      ip1=None,            ip2=ref_meta['ip2'], ip3=ref_meta['ip3'],
-                                                      ig1=ref_meta['ig1'], ig2=ref_meta['ig2'], ig3=ref_meta['ig3'],
-                                                      typvar=ref_meta['typvar'], nomvar=ref_meta['nomvar'])
+            #save ip1, and key for later
+            key_list = [meta['key'] for meta in meta_list]
+            ip1_list = [meta['ip1'] for meta in meta_list]
+            nz = len(key_list)
         elif type(ip1) is list :
+            #all entries with same meta are listed at once 
+            #and matched with the desired ip1s
+            meta_list = _my_fstinl(iunit, datev=ref_meta['datev'], etiket=ref_meta['etiket'],
+                                   ip2=ref_meta['ip2'], ip3=ref_meta['ip3'],
+                                   ig1=ref_meta['ig1'], ig2=ref_meta['ig2'], ig3=ref_meta['ig3'],
+                                   typvar=ref_meta['typvar'], nomvar=ref_meta['nomvar'])
+            meta_from_ip1 = {}
+            for meta in meta_list:
+                #first entry found is kept, like fstinf would
+                meta_from_ip1.setdefault(meta['ip1'], meta)
+
             nz = 0
             key_list = []
             ip1_list = []
-            lev_list = []
             for myip1 in ip1:
-                #check if there are entries with same meta 
-                key_dict = _my_fstinf(iunit, datev=ref_meta['datev'], etiket=ref_meta['etiket'],
-                                      ip1=myip1,           ip2=ref_meta['ip2'], ip3=ref_meta['ip3'],
-                                      ig1=ref_meta['ig1'], ig2=ref_meta['ig2'], ig3=ref_meta['ig3'],
-                                      typvar=ref_meta['typvar'], nomvar=ref_meta['nomvar'])
-
-                if key_dict is not None :
+                meta = meta_from_ip1.get(myip1)
+                if meta is None :
+                    #fstinf matches old and new style encodings of the same level, 
+                    #exact ip1 comparison above does not
+                    key_dict = _my_fstinf(iunit, datev=ref_meta['datev'], etiket=ref_meta['etiket'],
+                                          ip1=myip1, ip2=ref_meta['ip2'], ip3=ref_meta['ip3'],
+                                          ig1=ref_meta['ig1'], ig2=ref_meta['ig2'], ig3=ref_meta['ig3'],
+                                          typvar=ref_meta['typvar'], nomvar=ref_meta['nomvar'])
+                    if key_dict is not None :
+                        meta = _cached_fstprm(iunit, key_dict['key'])
+                if meta is not None :
                     #we have a valid entry save info for later
                     nz += 1
-                    meta = rmn.fstprm(key_dict['key'])
-                    (rp1, rp2, rp3) = rmn.DecodeIp(meta['ip1'],meta['ip2'],meta['ip3'])
                     #save ip1, and key for later
-                    key_list.append(key_dict['key'])
+                    key_list.append(meta['key'])
                     ip1_list.append(meta['ip1'])
-                    lev_list.append(rp1.v1)
                 else:
                     raise ValueError('No entries in fst file with ip1: '+str(myip1))
+        else:
+            #only one ip1 was requested
+            key_list = [ref_meta['key']]
+            ip1_list = [ref_meta['ip1']]
+
+        #levels for all ip1s decoded at once
+        lev_list = _decode_ip1_levels(ip1_list)
 
     #read data 
     if nz == 0 :
@@ -920,169 +1248,631 @@ def _get_var(file_name, var_name,
         ip1_arr = np.array(ip1_list)
         lev_arr = np.array(lev_list)
 
-        #sorted unique indices
-        dum, inds = np.unique(lev_arr, return_index=True)
-        #reverse order      hyb=1. is the lowest level
-        rev_inds = np.flip(inds, axis=0)
+        #indices sorting levels in decreasing order      hyb=1. is the lowest level
+        #   stable sort so that the first entry is kept when levels are repeated
+        rev_inds = np.argsort(-lev_arr, kind='stable')
 
         #raise error if there are non-unique levels represented
-        if ip1_arr.shape != rev_inds.shape:
+        sorted_lev = lev_arr[rev_inds]
+        is_first = np.concatenate(([True], sorted_lev[1:] != sorted_lev[:-1]))
+        if not np.all(is_first):
             warnings.warn('Found more than one entry in fst file with same meta; this may or may not be bad... ; adjusting nz')
+            rev_inds = rev_inds[is_first]
             nz = len(rev_inds)
 
         #shape of final array
         shape =  (ref_meta['shape'][0],ref_meta['shape'][1],nz)
         if shape_only is not None:
-            # Close file
-            rmn.fstcloseall(iunit)
             return {'shape':shape}
 
+        #get grid and vgrid
+        #   only needed once we know that values will be read
+        grid, toctoc = _get_grid_cached(iunit, file_name, ref_meta, use_cache=use_cache) if load_grid else (None, None)
+
         #sorted arrays
         key_arr = key_arr[rev_inds]
         ip1_arr = ip1_arr[rev_inds]
         lev_arr = lev_arr[rev_inds]
 
         #read output
+        #   each level of a Fortran ordered array is contiguous in memory
+        #   fstluk reads data directly into it
         values = np.zeros(shape, order='F', dtype='float32')
         for kk in range(nz):
-            dum = rmn.fstluk(key_arr[kk].item())
-            values[:,:,kk] = dum['d']
-
-    # Close file
-    rmn.fstcloseall(iunit)
-    return {'values':np.squeeze(values), 
+            try:
+                rmn.fstluk(key_arr[kk].item(), dataArray=values[:,:,kk])
+            except (TypeError, ValueError):
+                #record not float32 or older rpnpy, read in a temporary array
+                dum = rmn.fstluk(key_arr[kk].item())
+                values[:,:,kk] = dum['d']
+
+    if squeeze:
+        values = np.squeeze(values)
+    return {'values':values, 
             'meta':ref_meta,
             'grid':grid,
             'toctoc':toctoc,
             'ip1_list':ip1_arr.tolist(),
             'lev_list':lev_arr.tolist()}
 
-#end _get_var---------------------------
+#end _read_var---------------------------
+
 
+def _default_tmp_dir(needed_bytes):
+    """
+    Directory for temporary files when tmp_dir is not specified
+
+    Memory backed /dev/shm is used when it has room for twice needed_bytes, 
+    otherwise the default temporary directory of tempfile is used ($TMPDIR if it is set).
+    """
+    import shutil
+    import tempfile
+
+    shm_dir = '/dev/shm'
+    if os.path.isdir(shm_dir) and os.access(shm_dir, os.W_OK):
+        try:
+            free_bytes = shutil.disk_usage(shm_dir).free
+        except OSError:
+            free_bytes = 0
+        if free_bytes > 2 * needed_bytes:
+            return shm_dir
+
+    return tempfile.gettempdir()
+
+
+def _find_pxs2pxt():
+    """
+    Path to d.pxs2pxt, None if it is not in $PATH
+
+    The lookup is cached for the current $PATH, it is done again if $PATH changes.
+    """
+    return _which_pxs2pxt(os.environ.get('PATH'))
+
+
+@functools.lru_cache(maxsize=4)
+def _which_pxs2pxt(path):
+    """
+    Cached shutil.which for d.pxs2pxt in the directories of path
+    """
+    import shutil
+    return shutil.which('d.pxs2pxt', path=path)
+
+
+#grids and toctocs already read, see _get_grid_cached
+#   least recently used entries are dropped beyond _GRID_CACHE_SIZE
+_GRID_CACHE = collections.OrderedDict()
+_TOCTOC_CACHE = collections.OrderedDict()
+_GRID_CACHE_SIZE = 64
+
+#searches that found nothing, see _get_var
+#   least recently used entries are dropped beyond _GRID_CACHE_SIZE
+_MISS_CACHE = collections.OrderedDict()
+
+
+def clear_caches():
+    """Clear the caches of grids, toctocs (!!), standard file checks, record metadata and searches that found nothing
+
+    Cache entries are invalidated automatically when files are modified, 
+    calling this function is only needed to free memory.
+    """
+    _GRID_CACHE.clear()
+    _TOCTOC_CACHE.clear()
+    _MISS_CACHE.clear()
+    _is_fst.cache_clear()
+    _cached_fstprm.cache_clear()
+
+
+#number of records checked against IGs in _my_fstinf and how many of them were rejected
+_filter_stats = {'probes':0, 'ig_rejects':0}
+_FILTER_REJECT_WARN = 0.5
+_filter_warned = False
+
+
+def get_filter_stats():
+    """Number of records checked against the requested IGs and how many were rejected
+
+    A warning is issued, once, when more than half of the records found are rejected 
+    because of their IGs. Reading all records at once with a list of ip1 is then 
+    much more efficient than searching them one by one.
+
+    Returns
+    dict with 'probes' and 'ig_rejects'
+    """
+    import warnings
+    global _filter_warned
+
+    stats = dict(_filter_stats)
+    if (not _filter_warned and stats['probes'] > 0 and
+        stats['ig_rejects'] / stats['probes'] > _FILTER_REJECT_WARN):
+        warnings.warn('High IG-reject rate: consider reading all levels at once with a list of ip1')
+        _filter_warned = True
+    return stats
+
+
+def reset_filter_stats():
+    """Set the counters returned by get_filter_stats back to zero
+    """
+    global _filter_warned
+    _filter_stats['probes'] = 0
+    _filter_stats['ig_rejects'] = 0
+    _filter_warned = False
+
+
+def _get_grid_cached(iunit, file_name, ref_meta, use_cache=True):
+    """
+    readGrid and toctoc (!!) lookups with results cached per file and grid descriptors
+
+    Cached entries are invalidated when the modification time of the file changes.
+    Use use_cache=False for temporary files, they are read without touching the caches.
+
+    Returns
+    grid, toctoc   None for any one that could not be read
+                   shallow copies of cached entries so that callers can modify them
+    """
+    import warnings
+
+    path = os.path.realpath(file_name)
+    mtime_ns = os.stat(path).st_mtime_ns
+
+    #get grid
+    grid_key = (path, ref_meta['grtyp'], ref_meta['ni'], ref_meta['nj'],
+                ref_meta['ig1'], ref_meta['ig2'], ref_meta['ig3'], ref_meta['ig4'])
+    grid = _lru_get(_GRID_CACHE, grid_key, mtime_ns) if use_cache else None
+    if grid is None:
+        try:
+            grid     = rmn.readGrid(iunit, ref_meta)
+            if use_cache:
+                _lru_put(_GRID_CACHE, grid_key, mtime_ns, grid)
+        except:
+            warnings.warn('rmn.readGrid encountered a problem, setting grid to None')
+            grid = None
+
+    #get vgrid
+    toctoc_key = (path, ref_meta['ig1'], ref_meta['ig2'])
+    toctoc = _lru_get(_TOCTOC_CACHE, toctoc_key, mtime_ns) if use_cache else None
+    if toctoc is None:
+        try:
+            toctoc   = rmn.fstlir(iunit,nomvar='!!',ip1=ref_meta['ig1'],ip2=ref_meta['ig2'])
+            if use_cache:
+                _lru_put(_TOCTOC_CACHE, toctoc_key, mtime_ns, toctoc)
+        except:
+            warnings.warn('No !! entry found in file, setting toctoc to None')
+            toctoc = None
+
+    return (None if grid   is None else dict(grid), 
+            None if toctoc is None else dict(toctoc))
+
+
+def _lru_get(cache, key, mtime_ns):
+    """
+    Entry of cache for key, None if absent or saved for another modification time
+    """
+    cached = cache.get(key)
+    if cached is None or cached[0] != mtime_ns:
+        return None
+    cache.move_to_end(key)
+    return cached[1]
+
+
+def _lru_put(cache, key, mtime_ns, value):
+    """
+    Save value in cache, dropping least recently used entries beyond _GRID_CACHE_SIZE
+    """
+    if value is None:
+        return
+    cache[key] = (mtime_ns, value)
+    cache.move_to_end(key)
+    while len(cache) > _GRID_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _probe_file_for_vars(file_name, var_names,
+                         datev=None,
+                         ip1=None, ip2=None, ip3=None,
+                         ig1=None, ig2=None, ig3=None,
+                         typvar=None, etiquette=None,
+                         assume_fst=False) :
+    """
+    Look for many variables in a fst file that is opened only once
+
+    Variables are searched in the order they are given and the search stops at the 
+    first variable that is not found.
+
+    Returns
+    None if file_name is not a standard file or if one of the variables is not found
+    otherwise a dictionary {var_name: meta} with the meta of the first matching entry for each variable
+    """
+
+    if (not assume_fst) and (not _is_fst_file(file_name)) :
+        return None
+
+    try:
+        iunit = rmn.fstopenall(file_name, rmn.FST_RO)
+    except:
+        raise rmn.FSTDError("File not found/readable: %s" % file_name)
+
+    #unspecified search criteria match anything
+    criteria = _search_criteria(datev=datev, etiket=etiquette,
+                                ip2=ip2, ip3=ip3, typvar=typvar)
+
+    #as in _read_var, the first ip1 found is used when a list is provided
+    if type(ip1) is list :
+        ip1_list = ip1
+    else:
+        ip1_list = [_FST_ANY_INT if ip1 is None else ip1]
+
+    found = {}
+    try:
+        for var_name in var_names :
+            key_dict = None
+            for this_ip1 in ip1_list :
+                key_dict = _my_fstinf(iunit, ip1=this_ip1,
+                                      ig1=ig1, ig2=ig2, ig3=ig3,
+                                      nomvar=var_name, **criteria)
+                if key_dict is not None :
+                    break
+            if key_dict is None :
+                return None
+            found[var_name] = _cached_fstprm(iunit, key_dict['key'])
+    finally:
+        _fstcloseall(iunit)
+
+    return found
+
+
+def _scan_dir(dir_name, prefix='', suffix=''):
+    """
+    List files in dir_name matching prefix*suffix that may be standard files
+
+    prefix and suffix follow glob rules, as in glob.glob(dir_name+'/'+prefix+'*'+suffix).
+    When suffix is '' and fst_extensions is set, files whose extension is not in fst_extensions 
+    (or numeric) are skipped, no file is opened.
+
+    Returns
+    list of (path, mtime_ns, size) for each file, most recently modified files first
+    """
+    import fnmatch
+    import glob
+
+    pattern = prefix + '*' + suffix
+
+    if os.sep in pattern:
+        #pattern includes sub-directories, rely on glob
+        paths = glob.glob(os.path.join(dir_name, pattern))
+    else:
+        #names are matched without materializing a list of all files in the directory
+        paths = []
+        with os.scandir(dir_name) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith('.') and not pattern.startswith('.'):
+                    #hidden files, like glob
+                    continue
+                if fnmatch.fnmatchcase(name, pattern):
+                    paths.append(entry.path)
+
+    #files matching a suffix given by the caller are never filtered out
+    check_extension = (fst_extensions is not None) and (suffix == '')
+
+    candidates = []
+    for path in paths:
+        if check_extension and not _has_fst_extension(path):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if not os.path.isfile(path):
+            continue
+        candidates.append((path, stat.st_mtime_ns, stat.st_size))
+
+    #most recent first
+    candidates.sort(key=lambda candidate: candidate[1], reverse=True)
+    return candidates
+
+
+def _dir_cache_file(dir_name):
+    """
+    Path of the file where results of searches in dir_name are saved
+
+    There is one file per searched directory in the per-user cache directory.
+    """
+    import hashlib
+
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    dir_hash = hashlib.sha1(os.path.realpath(dir_name).encode(errors='surrogateescape')).hexdigest()
+    return os.path.join(cache_dir, 'domcmc', dir_hash + '.json')
+
+
+def _dir_cache_keys(dir_name, prefix, suffix, cache_key, candidates):
+    """
+    Keys for the results of a directory search
+
+    Returns
+    pattern_key   key for the files matching prefix*suffix
+    snapshot      hash of the paths (relative to dir_name), modification times and sizes of these files
+    search_key    key for the search criteria, None if they cannot be represented in json
+    """
+    import hashlib
+    import json
+
+    def _builtin(obj):
+        #numpy scalars and the like
+        if hasattr(obj, 'item'):
+            return obj.item()
+        raise TypeError(f'{type(obj)} not supported in cache key')
+
+    snapshot = hashlib.sha1(repr(sorted((os.path.relpath(path, dir_name), mtime_ns, size)
+                                        for (path, mtime_ns, size) in candidates)).encode(errors='surrogateescape')).hexdigest()
+    try:
+        pattern_key = json.dumps([prefix, suffix])
+        search_key  = json.dumps(cache_key, default=_builtin)
+    except (TypeError, ValueError):
+        return None, snapshot, None
+    return pattern_key, snapshot, search_key
+
+
+def _dir_cache_get(dir_name, prefix, suffix, cache_key, candidates):
+    """
+    File found by a previous search in dir_name with the same criteria
+
+    The result is only valid if the candidate files, their modification times and sizes 
+    are the same as when the search was made.
+
+    Returns
+    path of the file, None if there is no valid result
+    """
+    import json
+    import fcntl
+
+    if not use_dir_cache:
+        return None
+
+    pattern_key, snapshot, search_key = _dir_cache_keys(dir_name, prefix, suffix, cache_key, candidates)
+    if search_key is None:
+        return None
+
+    try:
+        with open(_dir_cache_file(dir_name), 'r') as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            cache = json.load(f)
+        pattern = cache[pattern_key]
+        if pattern['snapshot'] != snapshot:
+            #files changed since the search was made
+            return None
+        file_name = pattern['files'][search_key]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+    #only files that are candidates of this search are accepted
+    #   paths relative to dir_name since files in different sub-directories may have the same name
+    for (path, mtime_ns, size) in candidates:
+        if os.path.relpath(path, dir_name) == file_name:
+            return path
+    return None
+
+
+def _dir_cache_put(dir_name, prefix, suffix, cache_key, candidates, file_to_read):
+    """
+    Save the result of a directory search, see _dir_cache_get
+
+    Results saved for a previous state of the directory are dropped.
+    Nothing is done if the cache directory is not writable.
+    """
+    import json
+    import fcntl
+
+    if not use_dir_cache:
+        return
+
+    pattern_key, snapshot, search_key = _dir_cache_keys(dir_name, prefix, suffix, cache_key, candidates)
+    if search_key is None:
+        return
+
+    cache_file = _dir_cache_file(dir_name)
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(cache_file, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                cache = json.load(f)
+            except ValueError:
+                cache = {}
+            if not isinstance(cache, dict):
+                cache = {}
+            pattern = cache.get(pattern_key)
+            if not isinstance(pattern, dict) or pattern.get('snapshot') != snapshot:
+                #directory changed, previous results are stale
+                pattern = {'snapshot': snapshot, 'files': {}}
+                cache[pattern_key] = pattern
+            pattern['files'][search_key] = os.path.relpath(file_to_read, dir_name)
+            f.seek(0)
+            f.truncate()
+            json.dump(cache, f)
+    except OSError:
+        pass
+
+
+def _has_fst_extension(file_name):
+    """
+    True if the extension of file_name is one of fst_extensions or is numeric
+    """
+    ext = os.path.splitext(file_name)[1]
+    return (ext in fst_extensions) or ext[1:].isdigit()
+
+
+def _is_fst_file(file_name):
+    """
+    rmn.isFST with results cached for files that have not changed
+    """
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return False
+    return _is_fst(file_name, stat.st_mtime_ns, stat.st_size)
 
-def _my_fstinf(iunit, datev=None, etiket=None,
-               ip1=None, ip2=None, ip3=None,
+
+@functools.lru_cache(maxsize=4096)
+def _is_fst(file_name, mtime_ns, size):
+    """
+    Cached rmn.isFST, mtime and size are part of the key so that modified files are checked again
+    """
+    return rmn.isFST(file_name)
+
+
+def _decode_ip1_levels(ip1_list):
+    """
+    Decode levels from a list of ip1s
+
+    Each ip1 is decoded with rmn.DecodeIp through _decode_ip1_rmn, whose cache makes 
+    decoding the same levels again, for every variable and date, a dictionary lookup.
+
+    Returns
+    float array of levels, same as rmn.DecodeIp(ip1, ...)[0].v1 for each ip1
+    """
+    import numpy as np
+
+    return np.array([_decode_ip1_rmn(int(ip1)) for ip1 in ip1_list], dtype=np.float64)
+
+
+@functools.lru_cache(maxsize=4096)
+def _decode_ip1_rmn(ip1):
+    """
+    Level of one ip1 decoded with rmn.DecodeIp, cached since the decoding only depends on ip1
+    """
+    (rp1, rp2, rp3) = rmn.DecodeIp(ip1, 0, 0)
+    return rp1.v1
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_fstprm(iunit, key):
+    """
+    rmn.fstprm with results cached per unit and key
+
+    The cache is cleared by _fstcloseall since keys are only valid while a file is opened.
+    """
+    return rmn.fstprm(key)
+
+
+def _fstcloseall(iunit):
+    """
+    rmn.fstcloseall that also clears the cache of _cached_fstprm
+    """
+    _cached_fstprm.cache_clear()
+    rmn.fstcloseall(iunit)
+
+
+def _search_criteria(datev=None, etiket=None, ip2=None, ip3=None, typvar=None):
+    """
+    Keywords for _my_fstinf and _my_fstinl with None replaced by values that match anything
+    """
+    return {'datev':  _FST_ANY_INT if datev  is None else datev,
+            'etiket': _FST_ANY_STR if etiket is None else etiket,
+            'ip2':    _FST_ANY_INT if ip2    is None else ip2,
+            'ip3':    _FST_ANY_INT if ip3    is None else ip3,
+            'typvar': _FST_ANY_STR if typvar is None else typvar}
+
+
+def _igs_match(meta, ig1=None, ig2=None, ig3=None):
+    """
+    True if the IGs of a record (as returned by fstprm) match the ones provided
+
+    IGs set to None match anything.
+    """
+    return not ((ig1 is not None and ig1 != meta['ig1']) or
+                (ig2 is not None and ig2 != meta['ig2']) or
+                (ig3 is not None and ig3 != meta['ig3']))
+
+
+def _my_fstinf(iunit, datev=_FST_ANY_INT, etiket=_FST_ANY_STR,
+               ip1=_FST_ANY_INT, ip2=_FST_ANY_INT, ip3=_FST_ANY_INT,
                ig1=None, ig2=None, ig3=None,
-               typvar=None, nomvar=None):
+               typvar=_FST_ANY_STR, nomvar=None):
     """
     Wrapper for fstinf that allow :
-        - parameters to have the None value
         - filtering with the IGs
     """
-    import rpnpy.librmn.all as rmn
-
-    #defaults for fstinf
-    if datev        is None : datev=-1
-    if ip1          is None : ip1=-1
-    if ip2          is None : ip2=-1
-    if ip3          is None : ip3=-1
-    if typvar       is None : typvar=' '
-    if etiket       is None : etiket=' '
-
     #version to use if there were no bug in rpnpy/rmnlib
     #key_dict = rmn.fstinf(iunit, datev=datev, etiket=etiket,
     #                      ip1=ip1, ip2=ip2, ip3=ip3,
     #                      typvar=typvar, nomvar=nomvar)
 
 
-    #here we search for the good datev ourselves
-    key_dict = rmn.fstinf(iunit, etiket=etiket,
-                          ip1=ip1, ip2=ip2, ip3=ip3,
-                          typvar=typvar, nomvar=nomvar)
-    if (key_dict is not None and datev > 0):
-        meta = rmn.fstprm(key_dict['key'])
+    #positional arguments of fstinf and fstinl: iunit, datev, etiket, ip1, ip2, ip3, typvar, nomvar
+    #   datev is left to anything, we search for the good datev ourselves
+    search = (iunit, _FST_ANY_INT, etiket, ip1, ip2, ip3, typvar, nomvar)
+
+    key_dict = rmn.fstinf(*search)
+
+    #nothing found or nothing to check ourselves, fstinf answers directly
+    if key_dict is None:
+        return None
+    if datev <= 0 and ig1 is None and ig2 is None and ig3 is None:
+        return key_dict
+
+    if datev > 0:
+        meta = _cached_fstprm(iunit, key_dict['key'])
         if meta['datev'] != datev:
             #enter here only if we have the wrong datev
-            while key_dict is not None:
-                meta = rmn.fstprm(key_dict['key'])
+            #   all candidate records are listed at once instead of walking them with fstinfx
+            key_dict = None
+            for key in rmn.fstinl(*search):
+                meta = _cached_fstprm(iunit, key)
                 if meta['datev'] == datev:
+                    key_dict = {'key':key, 'shape':meta['shape']}
                     break
-                key_dict = rmn.fstinfx(key_dict, iunit, etiket=etiket,
-                                       ip1=ip1, ip2=ip2, ip3=ip3,
-                                       typvar=typvar, nomvar=nomvar)
     
     if (key_dict is not None) and ( (ig1 is not None) or (ig2 is not None) or (ig3 is not None) ) :
 
-        #get meta
-        meta = rmn.fstprm(key_dict['key'])
-
         #extra filtering of the IGs
         #   key is set to None if no match
-        if ig1 is not None:
-            if ig1 != meta['ig1']:
-                key_dict = None
-        if ig2 is not None:
-            if ig2 != meta['ig2']:
-                key_dict = None
-        if ig3 is not None:
-            if ig3 != meta['ig3']:
-                key_dict = None
+        _filter_stats['probes'] += 1
+        if not _igs_match(_cached_fstprm(iunit, key_dict['key']), ig1, ig2, ig3):
+            _filter_stats['ig_rejects'] += 1
+            key_dict = None
 
     return key_dict
 
 
-def _my_fstinfx(key, iunit, datev=None, etiket=None,
-                ip1=None, ip2=None, ip3=None,
-                ig1=None, ig2=None, ig3=None,
-                typvar=None, nomvar=None):
+def _my_fstinl(iunit, datev=_FST_ANY_INT, etiket=_FST_ANY_STR,
+               ip1=_FST_ANY_INT, ip2=_FST_ANY_INT, ip3=_FST_ANY_INT,
+               ig1=None, ig2=None, ig3=None,
+               typvar=_FST_ANY_STR, nomvar=None):
     """
-    Wrapper for fstinfx that allow :
-        - parameters to have the None value
-        - filtering with the IGs
+    Wrapper for fstinl that allow :
+        - filtering with datev and the IGs
 
     Returns
-    key         as usual
-    keep_this_one   a flag to indicate that a match was not found with the provided IGs
+    list of meta (as returned by fstprm) for all matching entries, in the order they appear in the file
     """
-    import rpnpy.librmn.all as rmn
 
-    #defaults for fstinfx
-    if datev        is None : datev=-1
-    if ip1          is None : ip1=-1
-    if ip2          is None : ip2=-1
-    if ip3          is None : ip3=-1
-    if typvar       is None : typvar=' '
-    if etiket       is None : etiket=' '
+    #datev is passed to fstinl so that records at other dates are not listed
+    #   as in _my_fstinf, we still check datev ourselves since librmn also returns 
+    #   records whose datestamps differ by less than one minute
+    #positional arguments, see _my_fstinf
+    key_list = rmn.fstinl(iunit, datev if datev > 0 else _FST_ANY_INT, etiket, ip1, ip2, ip3, typvar, nomvar)
 
-    keep_this_one=True
-    key_dict = rmn.fstinfx(key, iunit, datev=datev, etiket=etiket,
-                           ip1=ip1, ip2=ip2, ip3=ip3,
-                           typvar=typvar, nomvar=nomvar)
+    meta_list = []
+    for key in key_list:
+        meta = _cached_fstprm(iunit, key)
+        if (datev > 0 and meta['datev'] != datev) or not _igs_match(meta, ig1, ig2, ig3):
+            continue
+        meta_list.append(meta)
 
-    if (key_dict is not None) and ( (ig1 is not None) or (ig2 is not None) or (ig3 is not None) ) :
+    return meta_list
 
-        #get meta
-        meta = rmn.fstprm(key_dict['key'])
 
-        #extra filtering of the IGs
-        #   key is set to None if no match
-        if ig1 is not None:
-            if ig1 != meta['ig1']:
-                keep_this_one=False
-        if ig2 is not None:
-            if ig2 != meta['ig2']:
-                keep_this_one=False
-        if ig3 is not None:
-            if ig3 != meta['ig3']:
-                keep_this_one=False
-
-    return key_dict, keep_this_one
+#less verbose outputs on import
+#   this is not a great option but it will only print
+#    "c_fstopi option MSGLVL set to 6"
+#   once
+#   the flag on rmn avoids setting it again when this module is reloaded
+if not getattr(rmn, '_domcmc_msglvl_set', False):
+    rmn.fstopt(rmn.FSTOP_MSGLVL, rmn.FSTOPI_MSG_ERROR)
+    rmn._domcmc_msglvl_set = True
 
 if __name__ == '__main__' :
     #when called as main run tests
-    import rpnpy.librmn.all as rmn
     import doctest
-    rmn.fstopt(rmn.FSTOP_MSGLVL, rmn.FSTOPI_MSG_ERROR)
     doctest.testmod()
-
-else :
-    import rpnpy.librmn.all as rmn
-
-    #less verbose outputs on import
-    #   this is not a great option but it will only print
-    #    "c_fstopi option MSGLVL set to 6"
-    #   once
-    rmn.fstopt(rmn.FSTOP_MSGLVL, rmn.FSTOPI_MSG_ERROR)
-
-
-
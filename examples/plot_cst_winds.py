@@ -141,18 +141,14 @@ def main():
     yy_dest_crs = xy_crs[...,1]
 
     #plot arrows, the [1:-1] is to avoidovercrowding the figure
-    for xx_src, yy_src, xx_dst, yy_dst in zip(xx_crs[:,1:-1].flat, 
-                                              yy_crs[:,1:-1].flat, 
-                                              xx_dest_crs[:,1:-1].flat, 
-                                              yy_dest_crs[:,1:-1].flat):
-
-        color = 'darkorange'
-        lw = 1.5
-        ax.annotate("",
-                    xy=(xx_src, yy_src),       xycoords='data',
-                    xytext=(xx_dst, yy_dst), textcoords='data',
-                    arrowprops=dict(arrowstyle="<-", color=color, linewidth=lw,
-                    connectionstyle="arc3"), zorder=20 )
+    #   all arrows are drawn with a single call to quiver, they go from the data points to their destination
+    color = 'darkorange'
+    lw = 1.5
+    ax.quiver(xx_crs[:,1:-1], yy_crs[:,1:-1], 
+              xx_dest_crs[:,1:-1] - xx_crs[:,1:-1], 
+              yy_dest_crs[:,1:-1] - yy_crs[:,1:-1],
+              angles='xy', scale_units='xy', scale=1, color=color, 
+              width=0.003, transform=crs_rotatedpole, zorder=20)
 
     #line for legend
     verif_lines = mlines.Line2D([], [], linewidth=lw, color=color, label='Wind direction')